@@ -8,6 +8,8 @@
 import sys
 import os
 import datetime
+import json
+import hashlib
 
 class IDError(Exception):
     '''Handles invalid course and student ID's'''
@@ -41,6 +43,14 @@ class ResultEmptyError(Exception):
     '''Program quits gracefully in the event of an empty results file'''
     pass
 
+class DedupPolicyError(Exception):
+    '''Ensures only valid duplicate enrolment policies, "latest", "highest" or "graded"'''
+    pass
+
+class HistoryError(Exception):
+    '''Handles invalid term labels and missing or unreadable term partitions'''
+    pass
+
 class Results:
     def __init__(self, student, course, grade=""): 
         self.__student = student
@@ -80,21 +90,17 @@ class Results:
         return round(pass_rate, 2) #[4] rounding to 2 digits
     
     def get_course_summary(self, course_id, results_list):
+        '''Assumes results_list has already been deduplicated by Records.dedup_results, so each student appears once per course'''
         nfinish = 0
         nongoing = 0
         scores = []
-        unique_students = set()  # [5] I used set to remove duplicate nfinish and nongoing counts
         for result in results_list:
             if result.course == course_id:
                 if result.grade != "" and result.grade is not None:
-                    if result.student not in unique_students:
-                        scores.append(float(result.grade))
-                        nfinish += 1
-                        unique_students.add(result.student)
+                    scores.append(float(result.grade))
+                    nfinish += 1
                 else:
-                    if result.student not in unique_students:
-                        nongoing += 1
-                        unique_students.add(result.student)
+                    nongoing += 1
         if scores:
             average_score = sum(scores) / len(scores)
         else:
@@ -250,19 +256,15 @@ class Student:
         sys.stdout.write(f"Total Students: {total_students}. ")
 
     def get_enrolment(self, student_id, results_list):
+        '''Assumes results_list has already been deduplicated by Records.dedup_results, so each course appears once per student'''
         nfinish = 0
         nongoing = 0
-        unique_courses = set() #[5]
         for result in results_list:
             if result.student == student_id:
                 if result.grade != "" and result.grade is not None:
-                    if result.course not in unique_courses:
-                        nfinish += 1
-                        unique_courses.add(result.course)
+                    nfinish += 1
                 else:
-                    if result.course not in unique_courses:
-                        nongoing += 1
-                        unique_courses.add(result.course)
+                    nongoing += 1
         return nfinish, nongoing
     
     def get_gpa_100(self, student_id, results_list):
@@ -288,24 +290,25 @@ class Student:
         total_points = 0.0
         gpa_points = []  
         for grade in grades:
-            if grade < 49.5:
-                gpa_points.append(0.00)
-                total_points += 0.00
-            elif 49.5 <= grade < 59.5:
-                gpa_points.append(1.00)
-                total_points += 1.00
-            elif 59.5 <= grade < 69.5:
-                gpa_points.append(2.00)
-                total_points += 2.00
-            elif 69.5 <= grade < 79.5:
-                gpa_points.append(3.00)
-                total_points += 3.00
-            elif grade >= 79.5:
-                gpa_points.append(4.00)
-                total_points += 4.00
+            gpa_point = Student.get_grade_point(grade)
+            gpa_points.append(gpa_point)
+            total_points += gpa_point
         gpa_4 = total_points / len(grades)
         return round(gpa_4, 2), gpa_points
 
+    @staticmethod
+    def get_grade_point(grade):
+        '''Converts a grade out of 100 to its grade point out of 4'''
+        if grade < 49.5:
+            return 0.00
+        elif grade < 59.5:
+            return 1.00
+        elif grade < 69.5:
+            return 2.00
+        elif grade < 79.5:
+            return 3.00
+        return 4.00
+
 class UGStudent(Student):
     mode = "FT"
     def __init__(self, id, name, type):
@@ -343,6 +346,20 @@ class Records:
     course_list = []
     student_list = []
     results_list = []
+    raw_results_list = []  # every row as read, kept so the collapse can be re-run with another policy
+    dedup_policies = ("latest", "highest", "graded")
+    dedup_policy = "graded"
+    collapsed_count = 0
+
+    @classmethod #[1]
+    def set_dedup_policy(cls, policy):
+        '''"latest" keeps the last row in the results file, "highest" keeps the highest grade and "graded" keeps the latest graded row over ongoing ones.
+        Results that are already loaded are collapsed again under the new policy'''
+        if policy is None or str(policy).lower() not in cls.dedup_policies:
+            raise DedupPolicyError("Duplicate policy must be either 'latest', 'highest' or 'graded'!")
+        cls.dedup_policy = str(policy).lower()
+        if cls.raw_results_list:
+            cls.dedup_results()
     
     def read_courses(self, course_file):
         with open(course_file, "r") as file:
@@ -382,7 +399,9 @@ class Records:
                     student = PGStudent(student_id, student_name, student_type, student_mode)
                     self.student_list.append(student)
 
-    def read_results(self, result_file):
+    def read_results(self, result_file, dedup_policy=None):
+        if dedup_policy is not None:
+            self.set_dedup_policy(dedup_policy)
         with open(result_file, "r") as file:
             line = file.readlines()
             if not line:
@@ -401,7 +420,35 @@ class Records:
                         if grade < 0 or grade > 100:
                             raise GradeError("Grade must be within the valid range from 0 to 100!\n")
                 result = Results(student_id.strip(), course_id.strip(), grade)
-                self.results_list.append(result)
+                self.raw_results_list.append(result)
+        self.dedup_results()
+
+    @classmethod #[1]
+    def dedup_results(cls):
+        '''Collapses repeated (student, course) rows from raw_results_list using dedup_policy, so every statistic reads the same canonical results.
+        Rows are visited in file order, so a later row is treated as the more recent attempt.'''
+        canonical = {}
+        for result in cls.raw_results_list:
+            key = (result.student, result.course)
+            kept = canonical.get(key)
+            if kept is None or cls.is_preferred_result(result, kept):
+                canonical[key] = result
+        cls.collapsed_count = len(cls.raw_results_list) - len(canonical)
+        cls.results_list[:] = canonical.values()  # updates the shared list in place so every reference sees the canonical set
+        return cls.collapsed_count
+
+    @classmethod #[1]
+    def is_preferred_result(cls, result, kept):
+        '''Returns True if the later row should replace the kept row under the current dedup_policy'''
+        result_graded = result.grade != "" and result.grade is not None
+        kept_graded = kept.grade != "" and kept.grade is not None
+        if cls.dedup_policy == "latest":
+            return True
+        if result_graded != kept_graded:
+            return result_graded  # both "highest" and "graded" rank a grade above an ongoing enrolment
+        if cls.dedup_policy == "highest" and result_graded:
+            return float(result.grade) >= float(kept.grade)
+        return True
 
     def display_results(self):
         sys.stdout.write("\n\n- RESULTS -\n")
@@ -427,6 +474,7 @@ class Records:
         self.student_obj.get_student_numbers(self, self.student_list)
         self.course_obj.get_course_numbers(self, self.course_list)
         self.results_obj.get_pass_rate(self, self.results_list)
+        sys.stdout.write(f"Duplicate rows collapsed: {self.collapsed_count} (policy: {self.dedup_policy}).\n")
     
     def display_courses(self):
         sys.stdout.write("\n\n- COURSE INFORMATION -\n\n")
@@ -598,18 +646,262 @@ class Records:
             self.display_students()
         sys.stdout = sys.__stdout__  
 
+class TermHistory:
+    '''Stores each load of results as a term partition in a small versioned JSON file. Every partition holds per-student and per-course
+    aggregates computed once at save time, so cross-term queries only merge those aggregates instead of re-reading old input files.'''
+    partition_ext = ".json"
+    index_name = "terms.idx"
+    format_version = 1
+
+    def __init__(self, history_dir="history"):
+        self.__history_dir = history_dir
+        self.__partitions = {}  # cache of partitions already read from disk, keyed by term
+        self.__index = None  # term -> {"source_hash", "saved_at"}, read from index_name on first use
+
+    @property
+    def history_dir(self):
+        return self.__history_dir
+
+    def get_partition_path(self, term):
+        '''Assumes term labels only use letters, digits, "-" and "_", e.g. "2023_Sem1", so they are safe to use as file names'''
+        if term is None or str(term).strip() == "":
+            raise HistoryError("Term cannot be blank!")
+        elif not str(term).replace("-", "").replace("_", "").isalnum():
+            raise HistoryError("Term may only contain letters, digits, '-' and '_'!")
+        return os.path.join(self.__history_dir, str(term) + self.partition_ext)
+
+    def get_source_hash(self, *file_names):
+        '''Fingerprints the input files of a load so the same results are never saved as two different terms'''
+        source_hash = hashlib.sha1()
+        for file_name in file_names:
+            with open(file_name, "rb") as file:
+                source_hash.update(file.read())
+        return source_hash.hexdigest()
+
+    def build_partition(self, term, results_list, course_list, source_hash=None, saved_at=None):
+        '''Aggregates one term of results in a single pass. Students map to [graded, grade total, point total, weighted points, credit points,
+        missing credit points] and courses map to [nfinish, nongoing, grade total]'''
+        credit_points = {course.id: course.credit_point for course in course_list}
+        students = {}
+        courses = {}
+        for result in results_list:
+            student_totals = students.setdefault(result.student, [0, 0.0, 0.0, 0.0, 0, False])
+            course_totals = courses.setdefault(result.course, [0, 0, 0.0])
+            if result.grade != "" and result.grade is not None:
+                grade = float(result.grade)
+                gpa_point = Student.get_grade_point(grade)
+                student_totals[0] += 1
+                student_totals[1] += grade
+                student_totals[2] += gpa_point
+                cpt = credit_points.get(result.course)
+                if cpt is not None:
+                    student_totals[3] += gpa_point * cpt
+                    student_totals[4] += cpt
+                else:
+                    student_totals[5] = True  # same rule as Records.get_wgpa, no WGPA if a graded course has no credit points
+                course_totals[0] += 1
+                course_totals[2] += grade
+            else:
+                course_totals[1] += 1
+        if saved_at is None:
+            saved_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return {"version": self.format_version, "term": str(term), "source_hash": source_hash, "saved_at": saved_at,
+                "students": students, "courses": courses}
+
+    def write_json(self, path, data):
+        os.makedirs(self.__history_dir, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(temp_path, path)  # a half-written file never replaces a good one
+
+    def get_index(self):
+        '''Reads the term index, rebuilding it from the readable partitions if it is missing or damaged, so one bad file never blocks a save'''
+        if self.__index is not None:
+            return self.__index
+        index_path = os.path.join(self.__history_dir, self.index_name)
+        try:
+            with open(index_path, "r") as file:
+                index = json.load(file)
+            if not isinstance(index, dict) or not all(isinstance(entry, dict) for entry in index.values()):
+                raise ValueError("unexpected index format")
+        except (OSError, ValueError):
+            index = {}
+            for term in self.get_partition_terms():
+                try:
+                    partition = self.load_partition(term)
+                except HistoryError:
+                    continue  # reported by get_readable_terms when the history is displayed
+                index[term] = {"source_hash": partition["source_hash"], "saved_at": partition["saved_at"]}
+        self.__index = index
+        return index
+
+    def find_term_by_hash(self, source_hash):
+        for term, entry in self.get_index().items():
+            if entry.get("source_hash") == source_hash:
+                return term
+        return None
+
+    def save_partition(self, term, results_list, course_list, source_hash=None):
+        '''Writes the term partition and returns the term it was saved as. If the same input files were already saved, that term is
+        re-aggregated in place instead of adding a new one, so re-running the program never counts a load twice'''
+        index = self.get_index()
+        if source_hash is not None:
+            term = self.find_term_by_hash(source_hash) or term
+        path = self.get_partition_path(term)
+        saved_at = index.get(str(term), {}).get("saved_at")  # a re-saved term keeps its place in the history
+        partition = self.build_partition(term, results_list, course_list, source_hash, saved_at)
+        self.write_json(path, partition)
+        self.__partitions[str(term)] = partition
+        index[str(term)] = {"source_hash": source_hash, "saved_at": partition["saved_at"]}
+        self.write_json(os.path.join(self.__history_dir, self.index_name), index)
+        return str(term)
+
+    def load_partition(self, term):
+        term = str(term)
+        if term in self.__partitions:
+            return self.__partitions[term]
+        path = self.get_partition_path(term)
+        if not os.path.isfile(path):
+            raise HistoryError(f"No saved results for term '{term}'!")
+        try:
+            with open(path, "r") as file:
+                partition = json.load(file)
+        except (OSError, ValueError) as e:
+            raise HistoryError(f"The saved results for term '{term}' could not be read: {e}")
+        if not self.is_valid_partition(partition):
+            raise HistoryError(f"The saved results for term '{term}' are not in the expected format!")
+        self.__partitions[term] = partition
+        return partition
+
+    def is_valid_partition(self, partition):
+        '''Checks the decoded partition has the version and shape written by build_partition before any query reads it'''
+        if not isinstance(partition, dict) or partition.get("version") != self.format_version:
+            return False
+        students = partition.get("students")
+        courses = partition.get("courses")
+        if not isinstance(students, dict) or not isinstance(courses, dict) or not isinstance(partition.get("saved_at"), str):
+            return False
+        for totals, size in [(student_totals, 6) for student_totals in students.values()] + [(course_totals, 3) for course_totals in courses.values()]:
+            if not isinstance(totals, list) or len(totals) != size:
+                return False
+            if not all(isinstance(total, (int, float)) for total in totals):
+                return False
+        return True
+
+    def get_partition_terms(self):
+        if not os.path.isdir(self.__history_dir):
+            return []
+        terms = []
+        for file_name in os.listdir(self.__history_dir):
+            if file_name.endswith(self.partition_ext):
+                terms.append(file_name[:-len(self.partition_ext)])
+        return terms
+
+    def get_terms(self):
+        '''Returns saved terms oldest first by the time each was first saved, whatever style their labels use'''
+        index = self.get_index()
+        return sorted(self.get_partition_terms(), key=lambda term: (index.get(term, {}).get("saved_at", ""), term))
+
+    def get_readable_terms(self):
+        '''Returns saved terms that can be read, reporting and skipping any damaged partition'''
+        terms = []
+        for term in self.get_terms():
+            try:
+                self.load_partition(term)
+            except HistoryError as e:
+                sys.stdout.write(str(e) + " It has been left out of the history.\n")
+                continue
+            terms.append(term)
+        return terms
+
+    def get_cumulative_gpa(self, student_id, terms=None):
+        '''Merges the student's aggregates across terms and returns (GPA(100), GPA(4), WGPA(4)), or None if nothing is graded'''
+        graded = 0
+        grade_total = 0.0
+        point_total = 0.0
+        weighted_total = 0.0
+        credit_total = 0
+        missing_credit_points = False
+        for term in (terms if terms is not None else self.get_terms()):
+            student_totals = self.load_partition(term)["students"].get(student_id)
+            if student_totals is None:
+                continue
+            graded += student_totals[0]
+            grade_total += student_totals[1]
+            point_total += student_totals[2]
+            weighted_total += student_totals[3]
+            credit_total += student_totals[4]
+            missing_credit_points = missing_credit_points or student_totals[5]
+        if graded == 0:
+            return None
+        if missing_credit_points or credit_total == 0:
+            wgpa = None
+        else:
+            wgpa = round(weighted_total / credit_total, 2)
+        return round(grade_total / graded, 2), round(point_total / graded, 2), wgpa
+
+    def get_course_trend(self, course_id, terms=None):
+        '''Returns a list of (term, average score) for each term the course ran, average is None if no one has finished it that term'''
+        trend = []
+        for term in (terms if terms is not None else self.get_terms()):
+            course_totals = self.load_partition(term)["courses"].get(course_id)
+            if course_totals is None:
+                continue
+            if course_totals[0]:
+                average_score = round(course_totals[2] / course_totals[0], 2)
+            else:
+                average_score = None
+            trend.append((term, average_score))
+        return trend
+
+    def display_history(self, student_list, course_list):
+        terms = self.get_readable_terms()
+        sys.stdout.write("\n\n- HISTORY -\n\n")
+        sys.stdout.write(f"Terms saved: {len(terms)}.\n\n")
+        sys.stdout.write("CUMULATIVE STUDENT GPA\n")
+        sys.stdout.write("-" * 72 + "\n")
+        sys.stdout.write("{:<10}\t{:<15}\t{:<10}\t{:<10}\t{:<10}\n".format("StudentID", "Name", "GPA(100)", "GPA(4)", "WGPA(4)"))
+        sys.stdout.write("-" * 72 + "\n")
+        for student in student_list:
+            cumulative_gpa = self.get_cumulative_gpa(student.id, terms)
+            if cumulative_gpa is None:
+                continue
+            gpa_100, gpa_4, wgpa = cumulative_gpa
+            wgpa = "--" if wgpa is None else f"{wgpa:.2f}"
+            sys.stdout.write("{:<10}\t{:<15}\t{:>8.2f}\t{:>6.2f}\t{:>7}\n".format(student.id, student.name, gpa_100, gpa_4, wgpa))
+        sys.stdout.write("\nCOURSE AVERAGE TREND\n")
+        sys.stdout.write("-" * 72 + "\n")
+        for course in course_list:
+            trend = self.get_course_trend(course.id, terms)
+            if not trend:
+                continue
+            averages = ", ".join(f"{term}: {'--' if average is None else f'{average:.2f}'}" for term, average in trend)
+            sys.stdout.write(f"{course.id:<10}\t{averages}\n")
+
 class Main:
     records = Records()
+    history = TermHistory("history")
     def display_school_information(self):
         args = sys.argv
-        args = ["my_school.py", "results.txt", "courses.txt", "students.txt"]
-        if len(args) != 4:
-            sys.stdout.write("Insufficient command line arguments.\nThe correct format is <result_file> <course_file> <student_file>.\n")
+        if len(args) == 1:
+            args = ["my_school.py", "results.txt", "courses.txt", "students.txt"]
+        if len(args) not in (4, 5, 6):
+            sys.stdout.write("Insufficient command line arguments.\nThe correct format is <result_file> <course_file> <student_file> [term] [latest|highest|graded].\n")
             sys.stdout.write("The program will be terminated.\n")
             return
         result_file = args[1]
         course_file = args[2]
         student_file = args[3]
+        if len(args) >= 5:
+            term = args[4]
+        else:
+            term = datetime.datetime.now().strftime("%Y%m%d_%H%M%S") # defaults to when the results were loaded
+        try:
+            self.history.get_partition_path(term)
+        except HistoryError as e:
+            sys.stdout.write(str(e) + "\nThe program will be terminated.\n")
+            return
 
         missing_files = []
         if not os.path.isfile(result_file): # [9]
@@ -624,8 +916,12 @@ class Main:
                 sys.stdout.write(f"\t- {missing_file} is missing.\n")
             sys.stdout.write("Please ensure these files exist in the same directory as the program.\nThe program will be terminated.\n\n")
             return
+        dedup_policy = args[5] if len(args) == 6 else None
         try:
-            self.records.read_results(result_file) 
+            self.records.read_results(result_file, dedup_policy) 
+        except DedupPolicyError as e:
+            sys.stdout.write(str(e) + "\nThe program will be terminated.\n")
+            return
         except ResultEmptyError as e:
             sys.stdout.write(str(e) + "The program will be terminated.\n")
             return
@@ -646,6 +942,14 @@ class Main:
         self.records.display_courses()
         self.records.display_students()
         self.records.save_reports("reports.txt")
+        try:
+            source_hash = self.history.get_source_hash(result_file, course_file)
+            saved_term = self.history.save_partition(term, self.records.results_list, self.records.course_list, source_hash)
+            if saved_term != term:
+                sys.stdout.write(f"\nThese results are already saved as term '{saved_term}', it has been updated instead.\n")
+            self.history.display_history(self.records.student_list, self.records.course_list)
+        except HistoryError as e:
+            sys.stdout.write(str(e) + "\n")
 
 if __name__ == "__main__": # [10]
     main = Main()
@@ -654,7 +958,9 @@ if __name__ == "__main__": # [10]
 '''Commentary
 1. Originally I had placed conditions on the setters for student names to avoid any numbers or special characters. However I realised this prevented me in 
 appending a "!" to students who did not enrol in the minimum number of courses required for their study mode. Took me a while to figure out the bug there ~
-2. My course and student attributes nfinish and nogoing was counting duplicates which I was confused about, so I used sets to remove duplicate counts
+2. My course and student attributes nfinish and nogoing was counting duplicates which I was confused about, so I originally used sets [5] inside get_enrolment and
+get_course_summary to remove duplicate counts. That left the GPA methods still counting duplicates, so repeated (student, course) rows are now collapsed once in
+Records.dedup_results when the results file is read, and every statistic reads that canonical list. The raw rows are kept so the policy can be changed afterwards.
 3. Initially I had programmed the get_gpa_4 method to return only the averaged gpa_4 but that made it difficult to calulate wgpa. Hence I returned a list of grade points
 for each course so I could calculated the weighted gpa more easily.
 4. I repeated really long lines of code to save the displayed tables to a reports file. I found out a shorter implementation through redirecting the print function, referenced below.